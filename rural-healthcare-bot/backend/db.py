@@ -1,42 +1,87 @@
 """
-Database connection setup using SQLAlchemy.
-Creates engine, SessionLocal, Base, and get_db dependency function for FastAPI.
+Database connection setup using SQLAlchemy's asyncio extension.
+Creates async engine, SessionLocal, Base, and get_db dependency function for FastAPI.
 Database file: patients.db
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
-from typing import Generator
+import os
+from sqlalchemy import event, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from typing import AsyncGenerator
 
-# SQLite database URL
-DATABASE_URL = "sqlite:///./patients.db"
+# SQLite database URL (aiosqlite driver keeps DB I/O off the event loop)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./patients.db")
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Required for SQLite
+# Create async SQLAlchemy engine. File databases get a bounded queue pool so
+# concurrent requests reuse connections; in-memory databases must share a
+# single connection or each one would see its own empty database.
+if ":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/").endswith("sqlite+aiosqlite:"):
+    engine = create_async_engine(DATABASE_URL, poolclass=StaticPool)
+else:
+    engine = create_async_engine(
+        DATABASE_URL,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=10,
+        max_overflow=20,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+    )
+
+# Number of pooled connections opened at startup
+POOL_WARM_CONNECTIONS = 5
+
+# Per-connection SQLite tuning: WAL journal with NORMAL sync avoids an fsync per commit
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
 )
 
-# Create session factory
-SessionLocal = sessionmaker(
-    autocommit=False,
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLITE_PRAGMAS to every new DBAPI connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+# DATABASE_URL may point at another backend, where these PRAGMAs would fail
+if engine.dialect.name == "sqlite":
+    event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+
+# Create async session factory
+SessionLocal = async_sessionmaker(
+    bind=engine,
     autoflush=False,
-    bind=engine
+    expire_on_commit=False
 )
 
 # Create base class for models
 Base = declarative_base()
 
 
-def get_db() -> Generator:
+async def warm_pool() -> None:
+    """
+    Open a pooled connection and run a trivial query so it is ready for requests.
+    """
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency function for FastAPI to get database session.
     
     Yields:
-        Session: SQLAlchemy database session
+        AsyncSession: SQLAlchemy async database session
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -3,18 +3,21 @@ FastAPI main application for Rural Healthcare Decision Support Bot.
 Includes CORS configuration, startup tasks, and route integration.
 """
 
+import asyncio
 import logging
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import sys
 from pathlib import Path
 
 # Add backend directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
-from db import engine, Base
+from db import engine, Base, warm_pool, POOL_WARM_CONNECTIONS
 from models import PatientQuery
-from rag import load_guidelines
+from rag import load_guidelines, unload_guidelines, start_batcher, stop_batcher
 from services.llm_service import initialize_groq
 from routes.diagnosis import router as diagnosis_router
 
@@ -30,6 +33,7 @@ app = FastAPI(
     title="Rural Healthcare Decision Support Bot",
     description="AI-powered healthcare guidance system for rural areas using RAG and Groq LLM",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware - allow all origins for development
@@ -42,12 +46,28 @@ app.add_middleware(
 )
 
 
+async def create_tables() -> None:
+    """Create database tables that do not exist yet."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def _create_tables_before_fork() -> None:
+    """Create tables in the parent process, then drop its pooled connections."""
+    try:
+        await create_tables()
+    finally:
+        await engine.dispose()
+
+
 @app.on_event("startup")
 async def startup_event():
     """
     Startup event handler.
     - Create database tables
+    - Warm database connection pool
     - Load RAG guidelines
+    - Start RAG query micro-batcher
     - Initialize Groq LLM service
     """
     logger.info("Application startup initiated...")
@@ -55,12 +75,21 @@ async def startup_event():
     try:
         # Create database tables
         logger.info("Creating database tables...")
-        Base.metadata.create_all(bind=engine)
+        await create_tables()
         logger.info("✓ Database tables created successfully")
         
     except Exception as e:
         logger.error(f"✗ Error creating database tables: {e}")
     
+    try:
+        # Open pooled connections up front so the first request doesn't pay for them
+        logger.info("Warming database connection pool...")
+        await asyncio.gather(*[warm_pool() for _ in range(POOL_WARM_CONNECTIONS)])
+        logger.info("✓ Database connection pool warmed")
+        
+    except Exception as e:
+        logger.error(f"✗ Error warming database connection pool: {e}")
+    
     try:
         # Load RAG guidelines
         logger.info("Loading medical guidelines for RAG...")
@@ -72,6 +101,13 @@ async def startup_event():
     except Exception as e:
         logger.error(f"✗ Error loading guidelines: {e}")
     
+    try:
+        # Coalesce concurrent retrievals into batched encode + search calls
+        await start_batcher()
+        
+    except Exception as e:
+        logger.error(f"✗ Error starting query micro-batcher: {e}")
+    
     try:
         # Initialize Groq LLM
         logger.info("Initializing Groq LLM service...")
@@ -90,6 +126,8 @@ async def startup_event():
 async def shutdown_event():
     """Shutdown event handler."""
     logger.info("Application shutting down...")
+    await stop_batcher()
+    await engine.dispose()
 
 
 # Include routers
@@ -104,6 +142,7 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "diagnose": "/api/diagnose (POST)",
+            "diagnose_stream": "/api/diagnose/stream (POST)",
             "docs": "/docs",
             "redoc": "/redoc"
         }
@@ -119,10 +158,35 @@ async def health_check():
 if __name__ == "__main__":
     import uvicorn
     
-    logger.info("Starting FastAPI server...")
+    # One process per two cores by default; override with WEB_CONCURRENCY
+    workers = int(os.getenv("WEB_CONCURRENCY", max(2, (os.cpu_count() or 2) // 2)))
+    
+    if workers > 1:
+        # Do one-time setup here so workers don't race to create tables and
+        # rebuild the index cache; each worker then finds both ready
+        logger.info("Preparing database and guideline index before starting workers...")
+        
+        try:
+            asyncio.run(_create_tables_before_fork())
+        except Exception as e:
+            logger.error(f"✗ Error creating database tables: {e}")
+        
+        try:
+            load_guidelines()
+        except Exception as e:
+            logger.error(f"✗ Error building guideline index: {e}")
+        finally:
+            # The parent only supervises workers; don't keep the model in memory
+            unload_guidelines()
+    
+    logger.info(f"Starting FastAPI server with {workers} workers...")
     uvicorn.run(
-        app,
+        "main:app",
+        app_dir=str(Path(__file__).parent),
         host="0.0.0.0",
         port=8000,
+        workers=workers,
+        loop="auto",  # uvloop when installed (uvicorn[standard], non-Windows)
+        http="auto",  # httptools when installed
         log_level="info"
     )
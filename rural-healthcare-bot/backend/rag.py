@@ -4,25 +4,89 @@ Loads PDF files from guidelines folder, creates FAISS index, and provides retrie
 """
 
 import os
+import asyncio
+import platform
+import functools
+import hashlib
+import pickle
+import re
+import shutil
+import subprocess
+from collections import deque
+from itertools import islice
 import numpy as np
-from typing import List, Tuple
+import torch
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Deque, Iterable, Iterator, List, Tuple
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
 import faiss
 import logging
+import multiprocessing
 
 try:
-    from PyPDF2 import PdfReader
+    import fitz  # PyMuPDF
 except ImportError:
-    PdfReader = None
+    fitz = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    try:
+        from PyPDF2 import PdfReader
+    except ImportError:
+        PdfReader = None
 
 logger = logging.getLogger(__name__)
 
 # Initialize sentence transformer model for embeddings
 MODEL_NAME = "all-MiniLM-L6-v2"
+EMBED_BATCH_SIZE = 64
+# "auto": torch.compile'd fp16 on GPU, ONNX Runtime INT8 on CPU; "torch": plain PyTorch
+EMBEDDER_BACKEND = os.getenv("EMBEDDER_BACKEND", "auto")
+# Dynamically quantized INT8 exports shipped in the model repository, tuned per CPU family
+if platform.machine().lower() in ("aarch64", "arm64"):
+    ONNX_MODEL_FILE = "onnx/model_qint8_arm64.onnx"
+else:
+    ONNX_MODEL_FILE = "onnx/model_quint8_avx2.onnx"
+
+# FAISS index settings (inner product on normalized vectors == cosine similarity)
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 32
+IVF_MIN_VECTORS = 50_000
+IVF_FACTORY = "IVF256,Flat"
+IVF_NPROBE = 8
+# Product quantization shrinks 384-dim fp32 vectors from 1536 B to 48 B each
+PQ_MIN_VECTORS = 100_000
+PQ_FACTORY = "OPQ48,IVF256,PQ48"
+
+# Chunking: pack whole sentences up to CHUNK_SIZE words, overlapping by CHUNK_OVERLAP words
+CHUNK_SIZE = 250
+CHUNK_OVERLAP = 40
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+# On-disk index cache; bump the version whenever chunking or indexing changes
+INDEX_CACHE_DIR = Path(__file__).parent / "index_cache"
+INDEX_FILE = INDEX_CACHE_DIR / "index.faiss"
+CHUNKS_FILE = INDEX_CACHE_DIR / "index.pkl"
+INDEX_CACHE_VERSION = 5
+
+# In-process LRU of retrieved contexts, keyed by normalized query
+CONTEXT_CACHE_SIZE = 1024
+
+# Micro-batching: queries arriving within BATCH_MAX_WAIT seconds share one encode + search
+BATCH_MAX_SIZE = 32
+BATCH_MAX_WAIT = 0.010
+
 embedder = None
 faiss_index = None
 guideline_chunks = []
+# Bumped on every load so cached contexts from a previous index are never served
+_index_version = 0
+# Describes how the embedder was loaded; embeddings differ slightly between backends
+_embedder_variant = "torch"
+_batcher = None
 
 
 def load_guidelines() -> bool:
@@ -32,12 +96,13 @@ def load_guidelines() -> bool:
     Returns:
         bool: True if guidelines loaded successfully, False otherwise
     """
-    global embedder, faiss_index, guideline_chunks
+    global embedder, faiss_index, guideline_chunks, _index_version
+    
+    _index_version += 1
     
     try:
         # Initialize embedder
-        logger.info(f"Loading embedder model: {MODEL_NAME}")
-        embedder = SentenceTransformer(MODEL_NAME)
+        embedder = _load_embedder()
         
         # Get guidelines folder path
         guidelines_path = Path(__file__).parent / "guidelines"
@@ -45,48 +110,42 @@ def load_guidelines() -> bool:
         if not guidelines_path.exists():
             logger.warning(f"Guidelines folder not found at {guidelines_path}")
             # Create empty index for testing
-            embeddings = embedder.encode(["No guidelines available"])
-            faiss_index = faiss.IndexFlatL2(embeddings.shape[1])
+            embeddings = _encode(["No guidelines available"])
+            faiss_index = faiss.IndexFlatIP(embeddings.shape[1])
             guideline_chunks = ["No clinical guidelines available. Please add PDF files to the guidelines folder."]
             return False
         
         # Extract text from all PDF files
-        all_text = []
-        pdf_files = list(guidelines_path.glob("*.pdf"))
+        pdf_files = sorted(guidelines_path.glob("*.pdf"))
         
         if not pdf_files:
             logger.warning("No PDF files found in guidelines folder")
-            embeddings = embedder.encode(["No guidelines available"])
-            faiss_index = faiss.IndexFlatL2(embeddings.shape[1])
+            embeddings = _encode(["No guidelines available"])
+            faiss_index = faiss.IndexFlatIP(embeddings.shape[1])
             guideline_chunks = ["No clinical guidelines available. Please add PDF files to the guidelines folder."]
             return False
         
         logger.info(f"Found {len(pdf_files)} PDF files")
         
-        for pdf_file in pdf_files:
-            try:
-                logger.info(f"Reading PDF: {pdf_file.name}")
-                if PdfReader is None:
-                    logger.warning(f"PyPDF2 not installed, skipping PDF: {pdf_file.name}")
-                    continue
-                    
-                pdf_reader = PdfReader(pdf_file)
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    text = page.extract_text()
-                    if text.strip():
-                        all_text.append(text)
-            except Exception as e:
-                logger.error(f"Error reading PDF {pdf_file.name}: {e}")
-                continue
+        # Reuse the persisted index if the guidelines have not changed
+        fingerprint = _guidelines_fingerprint(pdf_files)
+        cached = _load_index_cache(fingerprint)
+        if cached is not None:
+            faiss_index, guideline_chunks = cached
+            logger.info(f"Loaded cached FAISS index with {faiss_index.ntotal} vectors")
+            return True
         
-        # Split text into chunks (sentence-level chunking)
-        guideline_chunks = split_into_chunks(all_text, chunk_size=200)
+        # Split text into chunks (sentence-level chunking) per document as files are extracted
+        guideline_chunks = []
+        for pages in _iter_guideline_documents(pdf_files):
+            guideline_chunks.extend(
+                split_into_chunks(pages, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+            )
         
         if not guideline_chunks:
             logger.warning("No text extracted from PDFs")
-            embeddings = embedder.encode(["No guidelines available"])
-            faiss_index = faiss.IndexFlatL2(embeddings.shape[1])
+            embeddings = _encode(["No guidelines available"])
+            faiss_index = faiss.IndexFlatIP(embeddings.shape[1])
             guideline_chunks = ["No valid text extracted from guidelines."]
             return False
         
@@ -94,15 +153,18 @@ def load_guidelines() -> bool:
         
         # Create embeddings
         logger.info("Creating embeddings...")
-        embeddings = embedder.encode(guideline_chunks, show_progress_bar=True)
-        embeddings = embeddings.astype(np.float32)
+        embeddings = _encode(guideline_chunks, show_progress_bar=True)
         
         # Create FAISS index
-        dimension = embeddings.shape[1]
-        faiss_index = faiss.IndexFlatL2(dimension)
-        faiss_index.add(embeddings)
+        faiss_index = _build_index(embeddings)
         
         logger.info(f"FAISS index created with {faiss_index.ntotal} vectors")
+        
+        try:
+            _save_index_cache(fingerprint, faiss_index, guideline_chunks)
+        except Exception as e:
+            logger.warning(f"Could not persist FAISS index cache: {e}")
+        
         return True
         
     except Exception as e:
@@ -110,26 +172,377 @@ def load_guidelines() -> bool:
         return False
 
 
-def split_into_chunks(texts: List[str], chunk_size: int = 200) -> List[str]:
+def unload_guidelines() -> None:
+    """
+    Release the embedder, FAISS index and chunks loaded by load_guidelines().
+    """
+    global embedder, faiss_index, guideline_chunks, _index_version
+    
+    embedder = None
+    faiss_index = None
+    guideline_chunks = []
+    _index_version += 1
+
+
+def _guidelines_fingerprint(pdf_files: List[Path]) -> str:
+    """
+    Compute a hash identifying the guideline PDFs and indexing settings.
+    
+    Args:
+        pdf_files (List[Path]): Sorted list of guideline PDF paths
+    
+    Returns:
+        str: Hex digest that changes whenever the index must be rebuilt
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{INDEX_CACHE_VERSION}:{MODEL_NAME}:{_embedder_variant}:{CHUNK_SIZE}:{CHUNK_OVERLAP}".encode("utf-8"))
+    
+    for pdf_file in pdf_files:
+        digest.update(pdf_file.name.encode("utf-8"))
+        with open(pdf_file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    
+    return digest.hexdigest()
+
+
+def _load_index_cache(fingerprint: str):
+    """
+    Load the persisted FAISS index and chunks if they match the fingerprint.
+    
+    IO_FLAG_MMAP only memory-maps the inverted lists of the IVF/IVFPQ layouts
+    used for large corpora; the default HNSW index is read fully into RAM in
+    each process. Either way, loading is much cheaper than re-embedding.
+    
+    Args:
+        fingerprint (str): Expected guidelines fingerprint
+    
+    Returns:
+        Optional[Tuple[faiss.Index, List[str]]]: Index and chunks, or None on a cache miss
+    """
+    if not INDEX_FILE.exists() or not CHUNKS_FILE.exists():
+        return None
+    
+    try:
+        with open(CHUNKS_FILE, "rb") as f:
+            cached = pickle.load(f)
+        
+        if cached.get("fingerprint") != fingerprint:
+            logger.info("Guidelines changed since index was cached, rebuilding")
+            return None
+        
+        index = faiss.read_index(str(INDEX_FILE), faiss.IO_FLAG_MMAP)
+        _configure_search(index)
+        return index, cached["chunks"]
+        
+    except Exception as e:
+        logger.warning(f"Could not load FAISS index cache: {e}")
+        return None
+
+
+def _save_index_cache(fingerprint: str, index: faiss.Index, chunks: List[str]) -> None:
+    """
+    Persist the FAISS index and chunks alongside the guidelines fingerprint.
+    
+    Files are written to temporary paths and renamed so a concurrent reader
+    never sees a partially written cache.
+    
+    Args:
+        fingerprint (str): Guidelines fingerprint the index was built from
+        index (faiss.Index): Populated FAISS index
+        chunks (List[str]): Guideline chunks matching the index rows
+    """
+    INDEX_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    
+    index_tmp = INDEX_FILE.with_name(f"{INDEX_FILE.name}.{os.getpid()}.tmp")
+    chunks_tmp = CHUNKS_FILE.with_name(f"{CHUNKS_FILE.name}.{os.getpid()}.tmp")
+    
+    faiss.write_index(index, str(index_tmp))
+    with open(chunks_tmp, "wb") as f:
+        pickle.dump({"fingerprint": fingerprint, "chunks": chunks}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    os.replace(index_tmp, INDEX_FILE)
+    os.replace(chunks_tmp, CHUNKS_FILE)
+    logger.info(f"FAISS index cached to {INDEX_CACHE_DIR}")
+
+
+def _load_embedder() -> SentenceTransformer:
+    """
+    Load the sentence transformer with the fastest available backend.
+    
+    On GPU the model runs in half precision and is compiled with
+    torch.compile. On CPU the INT8-quantized ONNX export is run with ONNX
+    Runtime, falling back to eager PyTorch if ONNX support is not installed.
+    Set EMBEDDER_BACKEND=torch to always use eager PyTorch.
+    
+    Returns:
+        SentenceTransformer: Embedding model ready for encoding
     """
-    Split texts into chunks by word count.
+    global _embedder_variant
+    
+    optimize = EMBEDDER_BACKEND != "torch"
+    model = None
+    warmed_up = False
+    
+    if torch.cuda.is_available():
+        logger.info(f"Loading embedder model: {MODEL_NAME} (CUDA, fp16)")
+        model = SentenceTransformer(MODEL_NAME, device="cuda")
+        model.half()
+        _embedder_variant = "torch-cuda-fp16"
+        
+        if optimize:
+            try:
+                # dynamic=True avoids recompiling for every new sequence length
+                model[0].auto_model = torch.compile(model[0].auto_model, dynamic=True)
+                # Compilation happens on the first forward pass, so warm up here
+                model.encode(["warmup"])
+                warmed_up = True
+            except Exception as e:
+                logger.warning(f"torch.compile failed, falling back to eager mode: {e}")
+                compiled = model[0].auto_model
+                model[0].auto_model = getattr(compiled, "_orig_mod", compiled)
+    
+    elif optimize:
+        try:
+            logger.info(f"Loading embedder model: {MODEL_NAME} (CPU, ONNX Runtime INT8)")
+            model = SentenceTransformer(
+                MODEL_NAME,
+                backend="onnx",
+                model_kwargs={"file_name": ONNX_MODEL_FILE, "provider": "CPUExecutionProvider"},
+            )
+            _embedder_variant = f"onnx:{ONNX_MODEL_FILE}"
+        except Exception as e:
+            logger.warning(f"ONNX backend unavailable, falling back to PyTorch: {e}")
+            model = None
+    
+    if model is None:
+        logger.info(f"Loading embedder model: {MODEL_NAME} (CPU)")
+        model = SentenceTransformer(MODEL_NAME)
+        _embedder_variant = "torch"
+    
+    # Run one encode so tokenizer and kernels are initialized before the first request
+    if not warmed_up:
+        model.encode(["warmup"])
+    return model
+
+
+def _encode(texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+    """
+    Encode texts into L2-normalized float32 embeddings in batches.
     
     Args:
-        texts (List[str]): List of text strings to chunk
-        chunk_size (int): Number of words per chunk
+        texts (List[str]): Texts to encode
+        show_progress_bar (bool): Whether to display an encoding progress bar
+    
+    Returns:
+        np.ndarray: Embedding matrix of shape (len(texts), dimension)
+    """
+    embeddings = embedder.encode(
+        texts,
+        batch_size=EMBED_BATCH_SIZE,
+        show_progress_bar=show_progress_bar,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+    # fp16 models return float16 arrays; FAISS SIMD kernels need C-contiguous float32
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+def _build_index(embeddings: np.ndarray) -> faiss.Index:
+    """
+    Build an approximate inner-product FAISS index over normalized embeddings.
+    
+    Uses HNSW for typical corpora, an IVF index for large ones where HNSW
+    graph construction becomes expensive, and OPQ+IVFPQ for very large
+    ones so the compressed codes stay cache-resident.
+    
+    Args:
+        embeddings (np.ndarray): L2-normalized float32 embedding matrix
+    
+    Returns:
+        faiss.Index: Populated index configured for search
+    """
+    num_vectors, dimension = embeddings.shape
+    logger.info(f"FAISS compile options: {faiss.get_compile_options()}")
+    
+    if num_vectors >= IVF_MIN_VECTORS:
+        factory = PQ_FACTORY if num_vectors >= PQ_MIN_VECTORS else IVF_FACTORY
+        logger.info(f"Building {factory} index for {num_vectors} vectors")
+        index = faiss.index_factory(dimension, factory, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+    else:
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    
+    index.add(embeddings)
+    _configure_search(index)
+    return index
+
+
+def _configure_search(index: faiss.Index) -> None:
+    """
+    Apply query-time search parameters to a FAISS index.
+    
+    Args:
+        index (faiss.Index): Index to configure
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return
+    
+    ivf_index = faiss.try_extract_index_ivf(index)
+    if ivf_index is not None:
+        ivf_index.nprobe = IVF_NPROBE
+
+
+def _iter_guideline_documents(pdf_files: List[Path]) -> Iterator[List[str]]:
+    """
+    Yield the page texts of each guideline PDF, one list per file, in file order.
+    
+    PDFs are independent and extraction is CPU-bound, so files are spread
+    across worker processes. Keeping one list per file lets callers chunk each
+    document separately so chunks never span two guidelines.
+    
+    Args:
+        pdf_files (List[Path]): Guideline PDF paths
+    
+    Yields:
+        List[str]: Text of each non-empty page of one PDF
+    """
+    pdf_paths = [str(pdf_file) for pdf_file in pdf_files]
+    max_workers = min(len(pdf_paths), os.cpu_count() or 1)
+    
+    if max_workers > 1:
+        logger.info(f"Extracting PDFs with {max_workers} worker processes")
+        # Spawn rather than fork: by now the process holds torch/ONNX Runtime thread
+        # pools, tokenizer state and possibly a CUDA context, which are unsafe to fork
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            yield from executor.map(_extract_one, pdf_paths)
+    else:
+        for pdf_path in pdf_paths:
+            yield _extract_one(pdf_path)
+
+
+def _extract_one(path: str) -> List[str]:
+    """
+    Extract page texts from a single PDF, logging instead of raising on failure.
+    
+    Kept at module level so it can be dispatched to a ProcessPoolExecutor.
+    
+    Args:
+        path (str): Path to the PDF file
+    
+    Returns:
+        List[str]: Text of each non-empty page, empty if the PDF could not be read
+    """
+    pdf_file = Path(path)
+    
+    try:
+        logger.info(f"Reading PDF: {pdf_file.name}")
+        return _extract_pdf_pages(pdf_file)
+    except Exception as e:
+        logger.error(f"Error reading PDF {pdf_file.name}: {e}")
+        return []
+
+
+def _extract_pdf_pages(pdf_file: Path) -> List[str]:
+    """
+    Extract non-empty page texts from a PDF file.
+    
+    Prefers PyMuPDF (native C backend), then the pdftotext CLI if it is on
+    PATH, and only falls back to pypdf (or legacy PyPDF2) when neither is available.
+    
+    Args:
+        pdf_file (Path): Path to the PDF file
+    
+    Returns:
+        List[str]: Text of each non-empty page
+    """
+    pages = []
+    
+    if fitz is not None:
+        with fitz.open(str(pdf_file)) as doc:
+            for page in doc:
+                text = page.get_text("text")
+                if text.strip():
+                    pages.append(text)
+        return pages
+    
+    pdftotext = shutil.which("pdftotext")
+    if pdftotext is not None:
+        result = subprocess.run(
+            [pdftotext, "-q", "-layout", str(pdf_file), "-"],
+            capture_output=True,
+            check=True,
+        )
+        # pdftotext separates pages with form feeds
+        for text in result.stdout.decode("utf-8", errors="replace").split("\f"):
+            if text.strip():
+                pages.append(text)
+        return pages
+    
+    if PdfReader is not None:
+        pdf_reader = PdfReader(pdf_file)
+        for page in pdf_reader.pages:
+            text = page.extract_text() or ""
+            if text.strip():
+                pages.append(text)
+        return pages
+    
+    logger.warning(f"No PDF backend installed (PyMuPDF, pdftotext or pypdf), skipping PDF: {pdf_file.name}")
+    return pages
+
+
+def split_into_chunks(texts: Iterable[str], chunk_size: int = 250, overlap: int = 40) -> List[str]:
+    """
+    Split the pages of one document into sentence-aligned chunks with overlap.
+    
+    Sentences are packed greedily into a rolling word window until adding the
+    next one would exceed chunk_size words; the last overlap words of each
+    chunk are repeated at the start of the next. The window carries across
+    texts, so a sentence broken by a page boundary stays in one chunk; call
+    once per document so chunks never mix unrelated documents.
+    Sentences longer than chunk_size are split by words.
+    
+    Args:
+        texts (Iterable[str]): Page texts of a single document, consumed lazily
+        chunk_size (int): Maximum number of words per chunk
+        overlap (int): Number of trailing words carried into the next chunk
     
     Returns:
         List[str]: List of text chunks
     """
+    overlap = max(0, min(overlap, chunk_size - 1))
     chunks = []
+    current: Deque[str] = deque()
+    pending = 0  # words in current not yet emitted in any chunk
     
     for text in texts:
-        words = text.split()
-        
-        for i in range(0, len(words), chunk_size):
-            chunk = " ".join(words[i:i + chunk_size])
-            if chunk.strip():
-                chunks.append(chunk)
+        for sentence in _SENTENCE_RE.split(text):
+            words = sentence.split()
+            if not words:
+                continue
+            
+            if pending and len(current) + len(words) > chunk_size:
+                chunks.append(" ".join(current))
+                while len(current) > overlap:
+                    current.popleft()
+                pending = 0
+            
+            current.extend(words)
+            pending += len(words)
+            
+            while len(current) > chunk_size:
+                chunks.append(" ".join(islice(current, chunk_size)))
+                for _ in range(chunk_size - overlap):
+                    current.popleft()
+                pending = len(current) - overlap
+    
+    if pending > 0:
+        chunks.append(" ".join(current))
     
     return chunks
 
@@ -155,24 +568,209 @@ def retrieve_context(query: str, k: int = 3) -> str:
         return "No clinical guidelines available."
     
     try:
-        # Encode query
-        query_embedding = embedder.encode([query])
-        query_embedding = query_embedding.astype(np.float32)
+        return _retrieve_context_cached(_normalize_query(query), k, _index_version)
         
-        # Search FAISS index
-        distances, indices = faiss_index.search(query_embedding, min(k, len(guideline_chunks)))
+    except Exception as e:
+        logger.error(f"Error retrieving context: {e}")
+        return "Error retrieving clinical guidelines."
+
+
+def _normalize_query(query: str) -> str:
+    """
+    Lowercase a query and collapse whitespace so equivalent queries share a cache entry.
+    
+    The MiniLM tokenizer is uncased, so lowercasing does not change the embedding.
+    
+    Args:
+        query (str): Raw user query
+    
+    Returns:
+        str: Normalized query
+    """
+    return " ".join(query.lower().split())
+
+
+@functools.lru_cache(maxsize=CONTEXT_CACHE_SIZE)
+def _retrieve_context_cached(query_normalized: str, k: int, index_version: int) -> str:
+    """
+    Embed a normalized query and search the FAISS index, memoizing the result.
+    
+    Args:
+        query_normalized (str): Query after _normalize_query()
+        k (int): Number of top chunks to retrieve
+        index_version (int): Index generation, part of the cache key only
+    
+    Returns:
+        str: Concatenated context from top matching chunks
+    """
+    ids = _search_one(query_normalized, k)
+    
+    # Retrieve and concatenate chunks; FAISS pads missing neighbours with -1
+    mask = (ids >= 0) & (ids < len(guideline_chunks))
+    retrieved_chunks = [guideline_chunks[idx] for idx in ids[mask].tolist()]
+    
+    if not retrieved_chunks:
+        return "No clinical guidelines available."
+    
+    context = "\n\n".join(retrieved_chunks)
+    logger.info(f"Retrieved {len(retrieved_chunks)} relevant guideline chunks")
+    
+    return context
+
+
+def _search(queries: List[str], k: int) -> np.ndarray:
+    """
+    Embed a batch of queries and search the FAISS index in one call each.
+    
+    Args:
+        queries (List[str]): Normalized queries
+        k (int): Number of neighbours to return per query
+    
+    Returns:
+        np.ndarray: Chunk ids of shape (len(queries), min(k, len(guideline_chunks)))
+    """
+    query_embeddings = _encode(queries)
+    _, indices = faiss_index.search(query_embeddings, min(k, len(guideline_chunks)))
+    return indices
+
+
+def _search_one(query: str, k: int) -> np.ndarray:
+    """
+    Search a single query, through the micro-batcher when one is running.
+    
+    Must not block the batcher's own event loop, so calls made on that loop
+    (or when no batcher is running) search directly.
+    
+    Args:
+        query (str): Normalized query
+        k (int): Number of neighbours to return
+    
+    Returns:
+        np.ndarray: Chunk ids of the nearest neighbours
+    """
+    batcher = _batcher
+    
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    
+    if batcher is not None and running_loop is not batcher.loop:
+        future = asyncio.run_coroutine_threadsafe(batcher.submit(query, k), batcher.loop)
+        return future.result()
+    
+    return _search([query], k)[0]
+
+
+class _QueryBatcher:
+    """
+    Coalesces concurrent queries into batched encode + search calls.
+    
+    Requests are queued as (query, k, future); a background task drains up to
+    BATCH_MAX_SIZE of them within BATCH_MAX_WAIT seconds, runs one _search()
+    on a dedicated thread, and resolves each future with its row of ids.
+    """
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # Own thread so batches never wait behind callers blocked in the default executor
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-batcher")
+        self._task = loop.create_task(self._run())
+        self._closed = False
+    
+    async def submit(self, query: str, k: int) -> np.ndarray:
+        """Queue a query and wait for its search result."""
+        if self._closed:
+            raise RuntimeError("Query batcher is stopped")
+        future = self.loop.create_future()
+        await self._queue.put((query, k, future))
+        return await future
+    
+    async def close(self) -> None:
+        """
+        Stop the background task and its worker thread.
         
-        # Retrieve and concatenate chunks
-        retrieved_chunks = []
-        for idx in indices[0]:
-            if idx < len(guideline_chunks):
-                retrieved_chunks.append(guideline_chunks[idx])
+        Queued and in-flight queries are failed rather than left pending, so
+        threads blocked waiting on them are released.
+        """
+        self._closed = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
         
-        context = "\n\n".join(retrieved_chunks)
-        logger.info(f"Retrieved {len(retrieved_chunks)} relevant guideline chunks")
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        self._fail(pending, RuntimeError("Query batcher is stopped"))
         
-        return context
+        self._executor.shutdown(wait=False)
+    
+    @staticmethod
+    def _fail(batch: list, error: BaseException) -> None:
+        """Resolve every unfinished future in a batch with an exception."""
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+    
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                await self._process(batch)
+            except asyncio.CancelledError:
+                self._fail(batch, RuntimeError("Query batcher is stopped"))
+                raise
+    
+    async def _process(self, batch: list) -> None:
+        """Collect more queries into the batch, search them, and resolve their futures."""
+        deadline = self.loop.time() + BATCH_MAX_WAIT
         
-    except Exception as e:
-        logger.error(f"Error retrieving context: {e}")
-        return "Error retrieving clinical guidelines."
+        while len(batch) < BATCH_MAX_SIZE:
+            timeout = deadline - self.loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        queries = [query for query, _, _ in batch]
+        max_k = max(k for _, k, _ in batch)
+        
+        try:
+            indices = await self.loop.run_in_executor(self._executor, _search, queries, max_k)
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        
+        logger.debug(f"Searched batch of {len(batch)} queries")
+        for row, (_, k, future) in zip(indices, batch):
+            if not future.done():
+                future.set_result(row[:k])
+
+
+async def start_batcher() -> None:
+    """
+    Start the query micro-batcher on the running event loop.
+    
+    Once started, retrieve_context() calls made from worker threads are
+    coalesced; calls on the event loop itself still search directly.
+    """
+    global _batcher
+    
+    if _batcher is None:
+        _batcher = _QueryBatcher(asyncio.get_running_loop())
+        logger.info("Query micro-batcher started")
+
+
+async def stop_batcher() -> None:
+    """Stop the query micro-batcher if it is running."""
+    global _batcher
+    
+    if _batcher is not None:
+        batcher, _batcher = _batcher, None
+        await batcher.close()
+        logger.info("Query micro-batcher stopped")
@@ -3,15 +3,18 @@ FastAPI router for healthcare diagnosis endpoint.
 Integrates RAG context retrieval and LLM response generation.
 """
 
+import asyncio
 import logging
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+import orjson
+from typing import AsyncIterator, List
+from fastapi import APIRouter, BackgroundTasks
+from fastapi.responses import StreamingResponse
 
 from schemas import QueryRequest, QueryResponse
-from db import get_db
+from db import SessionLocal
 from models import PatientQuery
 from rag import retrieve_context
-from services.llm_service import generate_answer
+from services.llm_service import extract_urgency, generate_answer, stream_answer
 
 logger = logging.getLogger(__name__)
 
@@ -21,10 +24,37 @@ router = APIRouter(
 )
 
 
+async def _persist_query(symptoms: str, answer_parts: List[str]) -> None:
+    """
+    Save a query and its full response to the database.
+    
+    Runs as a background task after the response has been sent, so the
+    commit is off the request's critical path.
+    
+    Args:
+        symptoms (str): Patient symptoms
+        answer_parts (List[str]): Response pieces (filled in while streaming)
+    """
+    if not answer_parts:
+        return
+    
+    try:
+        async with SessionLocal() as db:
+            db_query = PatientQuery(
+                symptoms=symptoms,
+                response="".join(answer_parts)
+            )
+            db.add(db_query)
+            await db.commit()
+            logger.info(f"Query saved with ID: {db_query.id}")
+    except Exception as e:
+        logger.error(f"Error saving query to database: {e}")
+
+
 @router.post("/diagnose", response_model=QueryResponse)
 async def diagnose(
     query: QueryRequest,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks
 ) -> QueryResponse:
     """
     Diagnose endpoint for healthcare guidance.
@@ -32,12 +62,12 @@ async def diagnose(
     Process:
     1. Retrieve relevant medical guidelines using RAG
     2. Generate healthcare guidance using Groq LLM
-    3. Save query and response to database
+    3. Schedule saving query and response to database
     4. Return formatted response with referral urgency
     
     Args:
         query (QueryRequest): Patient symptoms query
-        db (Session): Database session dependency
+        background_tasks (BackgroundTasks): Runs the database write after responding
     
     Returns:
         QueryResponse: Healthcare guidance response with urgency level
@@ -47,22 +77,14 @@ async def diagnose(
         
         # Step 1: Retrieve relevant guidelines using RAG
         logger.info("Retrieving relevant medical guidelines...")
-        context = retrieve_context(query.symptoms, k=3)
+        context = await asyncio.to_thread(retrieve_context, query.symptoms, 3)
         
         # Step 2: Generate response using LLM
         logger.info("Generating healthcare guidance...")
-        answer, referral_urgency = generate_answer(query.symptoms, context)
+        answer, referral_urgency = await generate_answer(query.symptoms, context)
         
-        # Step 3: Save to database
-        logger.info("Saving query to database...")
-        db_query = PatientQuery(
-            symptoms=query.symptoms,
-            response=answer
-        )
-        db.add(db_query)
-        db.commit()
-        db.refresh(db_query)
-        logger.info(f"Query saved with ID: {db_query.id}")
+        # Step 3: Save to database once the response has been sent
+        background_tasks.add_task(_persist_query, query.symptoms, [answer])
         
         # Step 4: Return response
         response = QueryResponse(
@@ -81,3 +103,49 @@ async def diagnose(
             answer=f"An error occurred while processing your request: {str(e)}. Please try again.",
             referral_urgency=None
         )
+
+
+@router.post("/diagnose/stream")
+async def diagnose_stream(
+    query: QueryRequest,
+    background_tasks: BackgroundTasks
+) -> StreamingResponse:
+    """
+    Streaming variant of the diagnose endpoint.
+    
+    Returns newline-delimited JSON: one {"delta": ...} object per generated
+    piece of guidance, then a final {"referral_urgency": ...} object (or
+    {"error": ...} if generation failed). The full response is saved to the
+    database after the stream completes.
+    
+    Args:
+        query (QueryRequest): Patient symptoms query
+        background_tasks (BackgroundTasks): Runs the database write after streaming
+    
+    Returns:
+        StreamingResponse: application/x-ndjson stream of guidance pieces
+    """
+    logger.info(f"Processing streaming diagnosis request for symptoms: {query.symptoms[:100]}...")
+    
+    context = await asyncio.to_thread(retrieve_context, query.symptoms, 3)
+    answer_parts: List[str] = []
+    
+    async def event_stream() -> AsyncIterator[bytes]:
+        try:
+            async for piece in stream_answer(query.symptoms, context):
+                answer_parts.append(piece)
+                yield orjson.dumps({"delta": piece}) + b"\n"
+        except Exception as e:
+            logger.error(f"Error streaming response from Groq: {e}")
+            answer_parts.clear()
+            yield orjson.dumps({"error": f"Error generating health guidance: {str(e)}"}) + b"\n"
+            return
+        
+        referral_urgency = extract_urgency("".join(answer_parts))
+        logger.info(f"Streamed response with urgency level: {referral_urgency}")
+        yield orjson.dumps({"referral_urgency": referral_urgency}) + b"\n"
+    
+    # Runs once the response body has been fully sent
+    background_tasks.add_task(_persist_query, query.symptoms, answer_parts)
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
@@ -4,19 +4,52 @@ Uses Groq API with llama-3.3-70b-versatile model.
 """
 
 import os
+import re
 import logging
-from typing import Optional
-from groq import Groq
+from typing import AsyncIterator, Optional
+from groq import AsyncGroq
 
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = "llama-3.3-70b-versatile"
+
+# Urgency levels as whole words, highest priority first
+_URGENCY_LEVELS = ("HIGH", "MEDIUM", "LOW")
+_URGENCY_RE = re.compile(r"\b(HIGH|MEDIUM|LOW)\b", re.IGNORECASE)
+
+# System prompt for rural healthcare assistant
+_SYSTEM_PROMPT = """You are a Rural Healthcare Decision Support Assistant. Your role is to:
+1. Provide preliminary health guidance based on symptoms and medical guidelines
+2. NEVER provide final diagnosis - emphasize this is preliminary support only
+3. Suggest when referral to a healthcare provider is needed with urgency level
+4. Be empathetic and clear in your language
+5. Recommend appropriate referral urgency: LOW (routine checkup), MEDIUM (within a few days), or HIGH (urgent/emergency)
+
+IMPORTANT: Always remind users that this is not a medical diagnosis and they should consult a qualified healthcare provider."""
+_SYSTEM_MESSAGE = {"role": "system", "content": _SYSTEM_PROMPT}
+
+# User message combining symptoms and context
+_USER_TEMPLATE = """Based on the following medical guidelines and patient symptoms, provide preliminary health guidance:
+
+PATIENT SYMPTOMS:
+{symptoms}
+
+MEDICAL GUIDELINES CONTEXT:
+{context}
+
+Please provide:
+1. Preliminary health guidance based on the symptoms and guidelines
+2. Possible conditions to discuss with a healthcare provider
+3. Recommended referral urgency level (LOW, MEDIUM, or HIGH)
+4. Home care recommendations if appropriate"""
+
 # Initialize Groq client
 client = None
 
 
 def initialize_groq() -> bool:
     """
-    Initialize Groq client with API key from environment variable.
+    Initialize async Groq client with API key from environment variable.
     
     Returns:
         bool: True if initialized successfully, False otherwise
@@ -30,7 +63,7 @@ def initialize_groq() -> bool:
             logger.error("GROQ_API_KEY environment variable not set")
             return False
         
-        client = Groq(api_key=api_key)
+        client = AsyncGroq(api_key=api_key)
         logger.info("Groq client initialized successfully")
         return True
         
@@ -39,72 +72,106 @@ def initialize_groq() -> bool:
         return False
 
 
-def generate_answer(symptoms: str, context: str) -> tuple[str, Optional[str]]:
+def _build_messages(symptoms: str, context: str) -> list[dict]:
     """
-    Generate healthcare guidance response using Groq LLM.
+    Build the chat messages for a healthcare guidance request.
     
     Args:
         symptoms (str): Patient's symptom description
         context (str): Medical guideline context retrieved by RAG
     
     Returns:
-        tuple: (answer, referral_urgency) where answer is the generated response
-               and referral_urgency is one of "LOW", "MEDIUM", "HIGH" or None
+        list: System and user messages for the chat completion API
     """
-    global client
+    return [
+        _SYSTEM_MESSAGE,
+        {"role": "user", "content": _USER_TEMPLATE.format(symptoms=symptoms, context=context)}
+    ]
+
+
+def extract_urgency(response_text: str) -> Optional[str]:
+    """
+    Extract the referral urgency level mentioned in a generated response.
     
-    if client is None:
-        logger.warning("Groq client not initialized. Calling initialize_groq()...")
-        if not initialize_groq():
-            return ("Unable to generate response: Groq service not available", None)
+    Args:
+        response_text (str): Generated healthcare guidance
     
-    try:
-        # System prompt for rural healthcare assistant
-        system_prompt = """You are a Rural Healthcare Decision Support Assistant. Your role is to:
-1. Provide preliminary health guidance based on symptoms and medical guidelines
-2. NEVER provide final diagnosis - emphasize this is preliminary support only
-3. Suggest when referral to a healthcare provider is needed with urgency level
-4. Be empathetic and clear in your language
-5. Recommend appropriate referral urgency: LOW (routine checkup), MEDIUM (within a few days), or HIGH (urgent/emergency)
+    Returns:
+        Optional[str]: "HIGH", "MEDIUM", "LOW" or None, highest level first
+    """
+    found = {level.upper() for level in _URGENCY_RE.findall(response_text)}
+    
+    for level in _URGENCY_LEVELS:
+        if level in found:
+            return level
+    return None
 
-IMPORTANT: Always remind users that this is not a medical diagnosis and they should consult a qualified healthcare provider."""
 
-        # User message combining symptoms and context
-        user_message = f"""Based on the following medical guidelines and patient symptoms, provide preliminary health guidance:
+def _ensure_client() -> bool:
+    """
+    Make sure the Groq client is initialized.
+    
+    Returns:
+        bool: True if the client is available, False otherwise
+    """
+    if client is None:
+        logger.warning("Groq client not initialized. Calling initialize_groq()...")
+        return initialize_groq()
+    return True
 
-PATIENT SYMPTOMS:
-{symptoms}
 
-MEDICAL GUIDELINES CONTEXT:
-{context}
+async def stream_answer(symptoms: str, context: str) -> AsyncIterator[str]:
+    """
+    Stream healthcare guidance from Groq LLM as it is generated.
+    
+    Args:
+        symptoms (str): Patient's symptom description
+        context (str): Medical guideline context retrieved by RAG
+    
+    Yields:
+        str: Successive pieces of the generated response
+    
+    Raises:
+        RuntimeError: If the Groq service is not available
+    """
+    if not _ensure_client():
+        raise RuntimeError("Groq service not available")
+    
+    # Call Groq API
+    stream = await client.chat.completions.create(
+        model=MODEL_NAME,
+        messages=_build_messages(symptoms, context),
+        max_tokens=1024,
+        temperature=0.7,
+        stream=True,
+    )
+    
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
 
-Please provide:
-1. Preliminary health guidance based on the symptoms and guidelines
-2. Possible conditions to discuss with a healthcare provider
-3. Recommended referral urgency level (LOW, MEDIUM, or HIGH)
-4. Home care recommendations if appropriate"""
 
-        # Call Groq API
-        message = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=1024,
-            temperature=0.7,
-        )
-        
-        response_text = message.choices[0].message.content
+async def generate_answer(symptoms: str, context: str) -> tuple[str, Optional[str]]:
+    """
+    Generate healthcare guidance response using Groq LLM.
+    
+    Args:
+        symptoms (str): Patient's symptom description
+        context (str): Medical guideline context retrieved by RAG
+    
+    Returns:
+        tuple: (answer, referral_urgency) where answer is the generated response
+               and referral_urgency is one of "LOW", "MEDIUM", "HIGH" or None
+    """
+    if not _ensure_client():
+        return ("Unable to generate response: Groq service not available", None)
+    
+    try:
+        response_text = "".join([piece async for piece in stream_answer(symptoms, context)])
         
         # Extract referral urgency from response
-        referral_urgency = None
-        if "HIGH" in response_text.upper():
-            referral_urgency = "HIGH"
-        elif "MEDIUM" in response_text.upper():
-            referral_urgency = "MEDIUM"
-        elif "LOW" in response_text.upper():
-            referral_urgency = "LOW"
+        referral_urgency = extract_urgency(response_text)
         
         logger.info(f"Generated response with urgency level: {referral_urgency}")
         
@@ -82,6 +82,21 @@ with st.sidebar:
     """)
 
 
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    Get a pooled HTTP session shared across Streamlit reruns.
+    
+    Streamlit re-executes this script on every interaction, so a plain
+    module-level session would be recreated each time; caching it as a
+    resource keeps keep-alive connections to the backend open between clicks.
+    
+    Returns:
+        requests.Session: Shared HTTP session
+    """
+    return requests.Session()
+
+
 def call_backend(symptoms: str) -> Optional[dict]:
     """
     Call backend /diagnose endpoint.
@@ -93,7 +108,7 @@ def call_backend(symptoms: str) -> Optional[dict]:
         dict: Response with answer and referral_urgency or None if error
     """
     try:
-        response = requests.post(
+        response = get_http_session().post(
             f"{API_URL}/diagnose",
             json={"symptoms": symptoms},
             timeout=30